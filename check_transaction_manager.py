@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Kiểm tra TransactionManager trên chuỗi thật: cấp phát nonce, gửi và đợi giao dịch,
+tăng phí giao dịch bị kẹt, gửi lại giao dịch bị loại khỏi mempool và lấp nonce trống.
+Chạy với chuỗi trong tiến trình (--in-process, cần eth-tester[py-evm]) hoặc với anvil (--rpc-url).
+eth-tester không nhận giao dịch có nonce ở phía sau khi tắt tự động đào block, vì vậy các kịch bản
+cần nhiều nonce đang chờ cùng lúc chỉ chạy với anvil.
+"""
+
+import sys
+import argparse
+import threading
+import time
+from web3 import Web3
+from eth_account import Account
+from transaction_manager import TransactionManager, raw_transaction
+from load_test import connect, fund_senders
+
+# Thời gian chờ (giây) trước khi tăng phí trong các kịch bản kiểm tra
+CHECK_BUMP_AFTER = 0.3
+
+# Khoảng thời gian (giây) giữa các lần kiểm tra receipt
+CHECK_POLL_INTERVAL = 0.1
+
+# Thời gian chờ tối đa (giây) cho mỗi giao dịch
+CHECK_TIMEOUT = 30
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Kiểm tra TransactionManager")
+    parser.add_argument("--rpc-url", default="http://127.0.0.1:8545",
+                        help="RPC của anvil (mặc định: http://127.0.0.1:8545)")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Chạy chuỗi trong tiến trình bằng eth-tester thay vì kết nối anvil")
+    parser.add_argument("--funder-key", default=None,
+                        help="Private key của tài khoản cấp ETH (mặc định: tài khoản đã mở khóa của node)")
+    return parser.parse_args()
+
+
+def set_automine(w3, enabled):
+    """Bật hoặc tắt tự động đào block khi nhận giao dịch"""
+    tester = getattr(w3.provider, "ethereum_tester", None)
+    if tester is None:
+        w3.provider.make_request("evm_setAutomine", [enabled])
+    elif enabled:
+        tester.enable_auto_mine_transactions()
+    else:
+        tester.disable_auto_mine_transactions()
+
+
+def mine_block(w3):
+    """Đào một block chứa các giao dịch đang chờ"""
+    w3.provider.make_request("evm_mine", [])
+
+
+def mine_later(w3, delay):
+    """Đào một block sau delay giây, giả lập giao dịch bị kẹt trong khoảng thời gian này"""
+    timer = threading.Timer(delay, mine_block, args=(w3,))
+    timer.start()
+    return timer
+
+
+def self_transfer(manager):
+    """Gửi giao dịch chuyển 0 ETH cho chính mình qua manager"""
+    return manager.submit({"to": manager.address, "value": 0, "gas": 21000})
+
+
+def send_outside_manager(w3, account, nonce):
+    """Gửi giao dịch với nonce chỉ định mà manager không biết (giả lập ví khác dùng cùng tài khoản)"""
+    tx = {
+        "from": account.address,
+        "to": account.address,
+        "value": 0,
+        "gas": 21000,
+        "nonce": nonce,
+        "chainId": w3.eth.chain_id,
+        "gasPrice": w3.eth.gas_price * 2
+    }
+    signed_tx = w3.eth.account.sign_transaction(tx, account.key)
+    w3.eth.send_raw_transaction(raw_transaction(signed_tx))
+    return signed_tx.hash
+
+
+def check_submit_and_wait(w3, account):
+    """Các giao dịch gửi liên tiếp nhận nonce liên tiếp và đều được xác nhận"""
+    manager = TransactionManager(w3, account.key, poll_interval=CHECK_POLL_INTERVAL)
+    start_nonce = w3.eth.get_transaction_count(account.address)
+
+    tx_hashes = [self_transfer(manager) for _ in range(3)]
+    receipts = [manager.wait_for_receipt(tx_hash, CHECK_TIMEOUT) for tx_hash in tx_hashes]
+    nonces = [w3.eth.get_transaction(tx_hash).nonce for tx_hash in tx_hashes]
+
+    return (
+        all(receipt.status == 1 for receipt in receipts)
+        and nonces == list(range(start_nonce, start_nonce + 3))
+        and all(manager.inclusion_time(tx_hash) is not None for tx_hash in tx_hashes)
+        and manager.bump_count == 0
+    )
+
+
+def check_bump_stuck(w3, account):
+    """Giao dịch bị kẹt được thay thế bằng bản có phí cao hơn, receipt vẫn tìm được bằng hash ban đầu"""
+    manager = TransactionManager(w3, account.key, bump_after=CHECK_BUMP_AFTER,
+                                 poll_interval=CHECK_POLL_INTERVAL)
+    set_automine(w3, False)
+    try:
+        tx_hash = self_transfer(manager)
+        mine_later(w3, CHECK_BUMP_AFTER * 4)
+        receipt = manager.wait_for_receipt(tx_hash, CHECK_TIMEOUT)
+    finally:
+        set_automine(w3, True)
+
+    return receipt.status == 1 and manager.bump_count >= 1 and receipt.transactionHash != tx_hash
+
+
+def check_bump_send_error(w3, account):
+    """Giao dịch thay thế được node nhận dù lời gọi gửi báo lỗi vẫn được nhận ra qua hash tính tại chỗ"""
+    manager = TransactionManager(w3, account.key, bump_after=CHECK_BUMP_AFTER,
+                                 poll_interval=CHECK_POLL_INTERVAL)
+    send_raw_transaction = w3.eth.send_raw_transaction
+
+    def send_then_fail(raw):
+        # Node nhận giao dịch nhưng phản hồi bị mất
+        send_raw_transaction(raw)
+        raise TimeoutError("Giả lập hết thời gian chờ HTTP")
+
+    set_automine(w3, False)
+    try:
+        tx_hash = self_transfer(manager)
+        time.sleep(CHECK_BUMP_AFTER * 2)
+
+        w3.eth.send_raw_transaction = send_then_fail
+        try:
+            manager.check_pending()
+        finally:
+            del w3.eth.send_raw_transaction
+
+        mine_block(w3)
+        receipt = manager.wait_for_receipt(tx_hash, CHECK_TIMEOUT)
+    finally:
+        set_automine(w3, True)
+
+    return receipt.status == 1 and receipt.transactionHash != tx_hash and manager.bump_count == 0
+
+
+def check_bump_only_blocking(w3, account):
+    """Chỉ nonce đang chặn được tăng phí; nonce phía sau có phí bằng phí đề xuất thì giữ nguyên"""
+    manager = TransactionManager(w3, account.key, bump_after=CHECK_BUMP_AFTER,
+                                 poll_interval=CHECK_POLL_INTERVAL)
+    set_automine(w3, False)
+    try:
+        first_hash = self_transfer(manager)
+        second_hash = self_transfer(manager)
+        time.sleep(CHECK_BUMP_AFTER * 2)
+        manager.check_pending()
+
+        bumped_once = manager.bump_count == 1
+        mine_block(w3)
+        receipts = [manager.wait_for_receipt(tx_hash, CHECK_TIMEOUT) for tx_hash in (first_hash, second_hash)]
+    finally:
+        set_automine(w3, True)
+
+    return (
+        bumped_once
+        and receipts[0].transactionHash != first_hash
+        and receipts[1].transactionHash == second_hash
+    )
+
+
+def check_gap_handling(w3, account):
+    """
+    Nonce do nơi khác gửi không bị lấp khi node còn giữ giao dịch đó,
+    chỉ được lấp khi giao dịch bị loại khỏi mempool; giao dịch của manager bị loại thì được gửi lại.
+    """
+    manager = TransactionManager(w3, account.key, bump_after=CHECK_BUMP_AFTER,
+                                 poll_interval=CHECK_POLL_INTERVAL)
+    first_hash = self_transfer(manager)
+    manager.wait_for_receipt(first_hash, CHECK_TIMEOUT)
+
+    set_automine(w3, False)
+    try:
+        gap_nonce = w3.eth.get_transaction_count(account.address)
+        foreign_hash = send_outside_manager(w3, account, gap_nonce)
+        tx_hash = self_transfer(manager)
+
+        # Node vẫn giữ giao dịch của nonce trống: không được lấp
+        time.sleep(CHECK_BUMP_AFTER * 2)
+        manager.fill_nonce_gaps()
+        kept_foreign = w3.eth.get_transaction(foreign_hash) is not None
+
+        # Giao dịch của manager và giao dịch nơi khác đều bị loại khỏi mempool
+        w3.provider.make_request("anvil_dropTransaction", [foreign_hash.hex()])
+        w3.provider.make_request("anvil_dropTransaction", [tx_hash.hex()])
+        manager.fill_nonce_gaps()
+        time.sleep(CHECK_BUMP_AFTER * 2)
+        manager.fill_nonce_gaps()
+
+        mine_block(w3)
+        receipt = manager.wait_for_receipt(tx_hash, CHECK_TIMEOUT)
+        filler = w3.eth.get_transaction_by_block(receipt.blockNumber, 0)
+    finally:
+        set_automine(w3, True)
+
+    return (
+        kept_foreign
+        and receipt.status == 1
+        and receipt.transactionHash == tx_hash
+        and filler.nonce == gap_nonce
+        and filler.hash != foreign_hash
+    )
+
+
+# (tên kịch bản, hàm kiểm tra, chỉ chạy với anvil)
+CHECKS = [
+    ("Gửi và đợi giao dịch", check_submit_and_wait, False),
+    ("Tăng phí giao dịch bị kẹt", check_bump_stuck, False),
+    ("Tăng phí khi lời gọi gửi báo lỗi", check_bump_send_error, False),
+    ("Chỉ tăng phí nonce đang chặn", check_bump_only_blocking, True),
+    ("Lấp nonce trống và gửi lại giao dịch bị loại", check_gap_handling, True),
+]
+
+
+def main():
+    args = parse_args()
+
+    w3, funder_key = connect(args)
+    if w3 is None:
+        sys.exit(1)
+    if not w3.is_connected():
+        print(f"Không thể kết nối đến {args.rpc_url}")
+        sys.exit(1)
+    funder_key = args.funder_key or funder_key
+
+    # Mỗi kịch bản dùng một tài khoản riêng để nonce không ảnh hưởng lẫn nhau
+    accounts = [Account.create() for _ in CHECKS]
+    if not fund_senders(w3, funder_key, accounts, Web3.to_wei(1, "ether"), CHECK_TIMEOUT):
+        print("Lỗi: Không thể cấp ETH cho các tài khoản kiểm tra")
+        sys.exit(1)
+
+    print("\n=== Kiểm tra TransactionManager ===")
+    failed = 0
+    for (name, check, anvil_only), account in zip(CHECKS, accounts):
+        if anvil_only and args.in_process:
+            print(f"- {name}: bỏ qua (cần anvil)")
+            continue
+
+        try:
+            passed = check(w3, account)
+        except Exception as e:
+            print(f"Lỗi trong kịch bản {name}: {e}")
+            passed = False
+
+        print(f"- {name}: {'đạt' if passed else 'KHÔNG ĐẠT'}")
+        failed += not passed
+
+    if failed:
+        print(f"\n{failed} kịch bản không đạt")
+        sys.exit(1)
+    print("\nTất cả kịch bản đều đạt")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,9 +12,16 @@ import solcx
 from web3 import Web3
 from eth_account import Account
 import time
+from deployment_registry import (
+    load_registry, find_deployment, find_deployment_by_name, record_deployment,
+    is_deployed, create2_salt, compute_create2_address, compute_deterministic_address,
+    DETERMINISTIC_DEPLOYER, FACTORY_SALT
+)
+from transaction_manager import TransactionManager, DEFAULT_BUMP_AFTER
 
 # Cấu hình kết nối đến mạng Sepolia thông qua Infura
-INFURA_URL = "https://sepolia.infura.io/v3/{URL_INFURA_YOUR_API_KEY}"
+# (có thể đổi sang mạng khác bằng biến môi trường RPC_URL)
+INFURA_URL = os.environ.get("RPC_URL", "https://sepolia.infura.io/v3/{URL_INFURA_YOUR_API_KEY}")
 w3 = Web3(Web3.HTTPProvider(INFURA_URL))
 
 # Thêm middleware cho mạng PoA (Proof of Authority)
@@ -33,6 +40,23 @@ print(f"Chain ID: {w3.eth.chain_id}")
 CONTRACT_PATH = os.path.join("src", "SimpleToken.sol")
 COMPILED_PATH = os.path.join("build", "SimpleToken.json")
 
+# File lưu địa chỉ contract của phiên bản cũ (trước khi có sổ đăng ký triển khai)
+LEGACY_ADDRESS_PATH = os.path.join("build", "contract_address.txt")
+
+# Phiên bản cũ chỉ triển khai trên Sepolia nên chỉ nhập địa chỉ cũ trên mạng này
+LEGACY_CHAIN_ID = 11155111
+
+# Đường dẫn đến factory CREATE2
+FACTORY_CONTRACT_PATH = os.path.join("src", "Create2Factory.sol")
+FACTORY_COMPILED_PATH = os.path.join("build", "Create2Factory.json")
+
+# Triển khai qua CREATE2 để địa chỉ contract có thể tính trước (đặt USE_CREATE2=1)
+USE_CREATE2 = os.environ.get("USE_CREATE2") == "1"
+DEPLOY_SALT = os.environ.get("DEPLOY_SALT", "SimpleToken-v1")
+
+# Số giây chờ trước khi thay thế giao dịch bị kẹt bằng bản sao có phí cao hơn
+TX_BUMP_AFTER = int(os.environ.get("TX_BUMP_AFTER", DEFAULT_BUMP_AFTER))
+
 
 def create_account():
     """Tạo một tài khoản Ethereum mới"""
@@ -77,9 +101,9 @@ def load_account_info(filename="account_info.json"):
         return None, None
 
 
-def compile_contract():
+def compile_contract(contract_path=CONTRACT_PATH, contract_name="SimpleToken", compiled_path=COMPILED_PATH):
     """Biên dịch smart contract Solidity"""
-    print("\n=== Biên dịch Smart Contract ===")
+    print(f"\n=== Biên dịch Smart Contract {contract_name} ===")
     
     # Cài đặt phiên bản solc
     solc_version = "0.8.19"
@@ -93,15 +117,15 @@ def compile_contract():
     
     try:
         # Kiểm tra xem tệp contract có tồn tại không
-        if not os.path.exists(CONTRACT_PATH):
-            print(f"Lỗi: Không tìm thấy tệp contract tại {CONTRACT_PATH}")
+        if not os.path.exists(contract_path):
+            print(f"Lỗi: Không tìm thấy tệp contract tại {contract_path}")
             return None
             
-        print(f"Đường dẫn đến contract: {os.path.abspath(CONTRACT_PATH)}")
+        print(f"Đường dẫn đến contract: {os.path.abspath(contract_path)}")
         
         # Biên dịch contract
         compiled_sol = solcx.compile_files(
-            [CONTRACT_PATH],
+            [contract_path],
             output_values=["abi", "bin"],
             optimize=True,
             optimize_runs=200
@@ -113,12 +137,12 @@ def compile_contract():
         # Lấy thông tin contract (sử dụng cách đúng tùy theo phiên bản solc)
         contract_id = ""
         for key in compiled_sol.keys():
-            if key.endswith(":SimpleToken"):
+            if key.endswith(f":{contract_name}"):
                 contract_id = key
                 break
         
         if not contract_id:
-            print("Không tìm thấy contract SimpleToken trong kết quả biên dịch")
+            print(f"Không tìm thấy contract {contract_name} trong kết quả biên dịch")
             return None
         
         print(f"Contract ID: {contract_id}")
@@ -128,10 +152,10 @@ def compile_contract():
         os.makedirs("build", exist_ok=True)
         
         # Lưu thông tin biên dịch vào file JSON
-        with open(COMPILED_PATH, "w") as f:
+        with open(compiled_path, "w") as f:
             json.dump(contract_interface, f)
         
-        print(f"Đã biên dịch thành công và lưu vào {COMPILED_PATH}")
+        print(f"Đã biên dịch thành công và lưu vào {compiled_path}")
         return contract_interface
     except Exception as e:
         print(f"Lỗi khi biên dịch contract: {e}")
@@ -139,9 +163,99 @@ def compile_contract():
         return None
 
 
-def deploy_contract(private_key, contract_interface, constructor_args):
+def load_compiled_contract(contract_path=CONTRACT_PATH, contract_name="SimpleToken", compiled_path=COMPILED_PATH):
+    """Đọc contract đã biên dịch, biên dịch nếu chưa có"""
+    if os.path.exists(compiled_path):
+        print(f"\nĐã tìm thấy contract đã biên dịch tại {compiled_path}")
+        with open(compiled_path, "r") as f:
+            return json.load(f)
+    
+    return compile_contract(contract_path, contract_name, compiled_path)
+
+
+def load_factory():
+    """Đọc Create2Factory đã biên dịch, biên dịch nếu chưa có"""
+    return load_compiled_contract(FACTORY_CONTRACT_PATH, "Create2Factory", FACTORY_COMPILED_PATH)
+
+
+def predict_create2_address(factory_address, contract_interface, constructor_args, deployer,
+                            salt_label=DEPLOY_SALT):
+    """Tính trước địa chỉ contract khi deployer triển khai qua Create2Factory"""
+    contract = w3.eth.contract(abi=contract_interface["abi"], bytecode=contract_interface["bin"])
+    init_code = contract.constructor(*constructor_args).data_in_transaction
+    return compute_create2_address(factory_address, deployer, create2_salt(salt_label), init_code)
+
+
+def token_matches_args(contract_address, abi, constructor_args):
+    """Kiểm tra name/symbol/decimals/totalSupply trên chuỗi có khớp với tham số constructor"""
+    name, symbol, decimals, initial_supply = constructor_args
+    try:
+        token = w3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=abi)
+        return (
+            token.functions.name().call() == name
+            and token.functions.symbol().call() == symbol
+            and token.functions.decimals().call() == decimals
+            and token.functions.totalSupply().call() == initial_supply * 10 ** decimals
+        )
+    except Exception as e:
+        print(f"Không thể đọc thông tin token tại {contract_address}: {e}")
+        return False
+
+
+def find_existing_deployment(contract_interface, constructor_args, deployer, contract_name="SimpleToken"):
+    """
+    Tìm contract đã triển khai trong sổ đăng ký với cùng mạng, bytecode và tham số constructor.
+    Chỉ cần một lần gọi eth_getCode để xác nhận, không gửi giao dịch nào.
+    """
+    chain_id = w3.eth.chain_id
+    registry = load_registry()
+    bytecode = contract_interface["bin"]
+    
+    entry = find_deployment(registry, chain_id, bytecode, constructor_args, deployer)
+    if entry:
+        if is_deployed(w3, entry["address"]):
+            return entry["address"]
+        print(f"Không có mã contract tại {entry['address']} (mạng đã được reset?), cần triển khai lại")
+    
+    # Phiên bản cũ lưu địa chỉ contract vào build/contract_address.txt (không ghi mạng).
+    # Chỉ nhập địa chỉ này trên Sepolia, khi sổ đăng ký chưa có contract nào cùng tên
+    # và thông tin token trên chuỗi khớp với tham số constructor.
+    if (contract_name == "SimpleToken" and chain_id == LEGACY_CHAIN_ID
+            and os.path.exists(LEGACY_ADDRESS_PATH)
+            and not find_deployment_by_name(registry, chain_id, contract_name)):
+        with open(LEGACY_ADDRESS_PATH, "r") as f:
+            legacy_address = f.read().strip()
+        if (Web3.is_address(legacy_address) and is_deployed(w3, legacy_address)
+                and token_matches_args(legacy_address, contract_interface["abi"], constructor_args)):
+            print(f"Đã nhập địa chỉ contract từ {LEGACY_ADDRESS_PATH} vào sổ đăng ký")
+            record_deployment(
+                registry, chain_id, bytecode, constructor_args, contract_name, legacy_address,
+                method="legacy", discovered_at=int(time.time())
+            )
+            return Web3.to_checksum_address(legacy_address)
+    
+    # Với CREATE2, địa chỉ factory và contract đều tính trước được mà không cần sổ đăng ký
+    if USE_CREATE2:
+        factory_interface = load_factory()
+        if factory_interface:
+            factory_address = compute_deterministic_address(factory_interface["bin"])
+            predicted_address = predict_create2_address(
+                factory_address, contract_interface, constructor_args, deployer
+            )
+            if is_deployed(w3, factory_address) and is_deployed(w3, predicted_address):
+                record_deployment(
+                    registry, chain_id, bytecode, constructor_args, contract_name, predicted_address,
+                    method="create2", deployer=deployer, factory=factory_address,
+                    salt=DEPLOY_SALT, discovered_at=int(time.time())
+                )
+                return predicted_address
+    
+    return None
+
+
+def deploy_contract(private_key, contract_interface, constructor_args, contract_name="SimpleToken"):
     """Triển khai smart contract đã biên dịch"""
-    print("\n=== Triển khai Smart Contract ===")
+    print(f"\n=== Triển khai Smart Contract {contract_name} ===")
     
     # Lấy thông tin tài khoản
     account = Account.from_key(private_key)
@@ -155,35 +269,173 @@ def deploy_contract(private_key, contract_interface, constructor_args):
     SimpleToken = w3.eth.contract(abi=abi, bytecode=bytecode)
     
     try:
-        # Lấy nonce
-        nonce = w3.eth.get_transaction_count(address)
+        # Trình quản lý giao dịch tự cấp phát nonce và tăng phí nếu giao dịch bị kẹt
+        tx_manager = TransactionManager(w3, private_key, bump_after=TX_BUMP_AFTER)
+        chain_id = tx_manager.chain_id
         
         # Xây dựng giao dịch triển khai
         transaction = SimpleToken.constructor(*constructor_args).build_transaction({
             "from": address,
-            "nonce": nonce,
             "gas": 3000000,
-            "gasPrice": w3.eth.gas_price,
-            "chainId": w3.eth.chain_id
+            "chainId": chain_id,
+            **tx_manager.suggest_fees()
         })
         
-        # Ký giao dịch
-        signed_tx = w3.eth.account.sign_transaction(transaction, private_key)
-        
-        # Gửi giao dịch
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        # Ký và gửi giao dịch
+        tx_hash = tx_manager.submit(transaction)
         print(f"Giao dịch triển khai đã được gửi: {tx_hash.hex()}")
         
         # Đợi giao dịch được xác nhận
         print("Đang đợi giao dịch được xác nhận...")
-        tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        tx_receipt = tx_manager.wait_for_receipt(tx_hash)
+        print(f"Giao dịch được đưa vào block sau {tx_manager.inclusion_time(tx_hash):.1f} giây")
+        
+        if tx_receipt.status != 1:
+            print("Giao dịch triển khai thất bại!")
+            return None, None
         
         contract_address = tx_receipt.contractAddress
         print(f"Contract đã được triển khai tại địa chỉ: {contract_address}")
         
-        # Lưu địa chỉ contract vào file
-        with open(os.path.join("build", "contract_address.txt"), "w") as f:
-            f.write(contract_address)
+        # Ghi vào sổ đăng ký triển khai
+        record_deployment(
+            load_registry(), chain_id, bytecode, constructor_args, contract_name, contract_address,
+            method="create", deployer=address, tx_hash=tx_hash.hex(), deployed_at=int(time.time())
+        )
+        
+        return contract_address, abi
+    except Exception as e:
+        print(f"Lỗi khi triển khai contract: {e}")
+        return None, None
+
+
+def get_or_deploy_factory(private_key):
+    """
+    Lấy địa chỉ Create2Factory trên mạng hiện tại, triển khai qua deterministic-deployment proxy nếu chưa có.
+    Địa chỉ factory chỉ phụ thuộc vào bytecode nên giống nhau trên mọi mạng và không cần sổ đăng ký.
+    """
+    factory_interface = load_factory()
+    if not factory_interface:
+        return None, None
+    
+    factory_abi = factory_interface["abi"]
+    factory_address = compute_deterministic_address(factory_interface["bin"])
+    if is_deployed(w3, factory_address):
+        print(f"Create2Factory đã có tại địa chỉ: {factory_address}")
+        return factory_address, factory_abi
+    
+    print("\n=== Triển khai Smart Contract Create2Factory qua deterministic-deployment proxy ===")
+    if not is_deployed(w3, DETERMINISTIC_DEPLOYER):
+        print(f"Mạng hiện tại chưa có deterministic-deployment proxy tại {DETERMINISTIC_DEPLOYER}")
+        return None, None
+    
+    print(f"Địa chỉ Create2Factory tính trước: {factory_address}")
+    
+    account = Account.from_key(private_key)
+    address = account.address
+    
+    try:
+        tx_manager = TransactionManager(w3, private_key, bump_after=TX_BUMP_AFTER)
+        chain_id = tx_manager.chain_id
+        
+        # Dữ liệu gọi proxy: salt (32 byte) nối với bytecode khởi tạo của factory
+        transaction = {
+            "from": address,
+            "to": DETERMINISTIC_DEPLOYER,
+            "data": "0x" + FACTORY_SALT.hex() + factory_interface["bin"],
+            "gas": 1000000,
+            "chainId": chain_id,
+            **tx_manager.suggest_fees()
+        }
+        
+        tx_hash = tx_manager.submit(transaction)
+        print(f"Giao dịch triển khai đã được gửi: {tx_hash.hex()}")
+        
+        print("Đang đợi giao dịch được xác nhận...")
+        tx_receipt = tx_manager.wait_for_receipt(tx_hash)
+        print(f"Giao dịch được đưa vào block sau {tx_manager.inclusion_time(tx_hash):.1f} giây")
+        
+        if tx_receipt.status != 1 or not is_deployed(w3, factory_address):
+            print("Giao dịch triển khai thất bại!")
+            return None, None
+        
+        print(f"Create2Factory đã được triển khai tại địa chỉ: {factory_address}")
+        
+        # Ghi vào sổ đăng ký để tra cứu, việc tìm lại factory không phụ thuộc vào bản ghi này
+        record_deployment(
+            load_registry(), chain_id, factory_interface["bin"], [], "Create2Factory", factory_address,
+            method="deterministic", deployer=address, factory=DETERMINISTIC_DEPLOYER,
+            tx_hash=tx_hash.hex(), deployed_at=int(time.time())
+        )
+        
+        return factory_address, factory_abi
+    except Exception as e:
+        print(f"Lỗi khi triển khai contract: {e}")
+        return None, None
+
+
+def deploy_contract_create2(private_key, contract_interface, constructor_args, factory_address, factory_abi,
+                            salt_label=DEPLOY_SALT, contract_name="SimpleToken"):
+    """Triển khai smart contract qua Create2Factory để địa chỉ có thể tính trước"""
+    print(f"\n=== Triển khai Smart Contract {contract_name} qua CREATE2 ===")
+    
+    # Lấy thông tin tài khoản
+    account = Account.from_key(private_key)
+    address = account.address
+    
+    # Lấy ABI và bytecode
+    abi = contract_interface["abi"]
+    bytecode = contract_interface["bin"]
+    
+    # Bytecode khởi tạo gồm bytecode và tham số constructor đã mã hóa
+    contract = w3.eth.contract(abi=abi, bytecode=bytecode)
+    init_code = contract.constructor(*constructor_args).data_in_transaction
+    salt = create2_salt(salt_label)
+    
+    contract_address = compute_create2_address(factory_address, address, salt, init_code)
+    print(f"Địa chỉ contract tính trước: {contract_address}")
+    
+    # Kiểm tra lại trước khi gửi để không triển khai trùng
+    if is_deployed(w3, contract_address):
+        print(f"Contract đã có tại địa chỉ: {contract_address}")
+        return contract_address, abi
+    
+    factory = w3.eth.contract(address=factory_address, abi=factory_abi)
+    
+    try:
+        # Trình quản lý giao dịch tự cấp phát nonce và tăng phí nếu giao dịch bị kẹt
+        tx_manager = TransactionManager(w3, private_key, bump_after=TX_BUMP_AFTER)
+        chain_id = tx_manager.chain_id
+        
+        # Xây dựng giao dịch gọi factory
+        transaction = factory.functions.deploy(salt, init_code).build_transaction({
+            "from": address,
+            "gas": 3000000,
+            "chainId": chain_id,
+            **tx_manager.suggest_fees()
+        })
+        
+        # Ký và gửi giao dịch
+        tx_hash = tx_manager.submit(transaction)
+        print(f"Giao dịch triển khai đã được gửi: {tx_hash.hex()}")
+        
+        # Đợi giao dịch được xác nhận
+        print("Đang đợi giao dịch được xác nhận...")
+        tx_receipt = tx_manager.wait_for_receipt(tx_hash)
+        print(f"Giao dịch được đưa vào block sau {tx_manager.inclusion_time(tx_hash):.1f} giây")
+        
+        if tx_receipt.status != 1 or not is_deployed(w3, contract_address):
+            print("Giao dịch triển khai thất bại!")
+            return None, None
+        
+        print(f"Contract đã được triển khai tại địa chỉ: {contract_address}")
+        
+        # Ghi vào sổ đăng ký triển khai
+        record_deployment(
+            load_registry(), chain_id, bytecode, constructor_args, contract_name, contract_address,
+            method="create2", deployer=address, factory=factory_address, salt=salt_label,
+            tx_hash=tx_hash.hex(), deployed_at=int(time.time())
+        )
         
         return contract_address, abi
     except Exception as e:
@@ -243,8 +495,8 @@ def interact_with_contract(contract_address, abi, private_key, to_address, amoun
             print(f"Không đủ token. Số dư: {balance / (10 ** decimals)} {symbol}, Cần chuyển: {amount} {symbol}")
             return False
         
-        # Lấy nonce
-        nonce = w3.eth.get_transaction_count(from_address)
+        # Trình quản lý giao dịch tự cấp phát nonce và tăng phí nếu giao dịch bị kẹt
+        tx_manager = TransactionManager(w3, private_key, bump_after=TX_BUMP_AFTER)
         
         # Xây dựng giao dịch transfer
         transaction = token_contract.functions.transfer(
@@ -252,22 +504,19 @@ def interact_with_contract(contract_address, abi, private_key, to_address, amoun
             amount_wei
         ).build_transaction({
             "from": from_address,
-            "nonce": nonce,
             "gas": 200000,
-            "gasPrice": w3.eth.gas_price,
-            "chainId": w3.eth.chain_id
+            "chainId": tx_manager.chain_id,
+            **tx_manager.suggest_fees()
         })
         
-        # Ký giao dịch
-        signed_tx = w3.eth.account.sign_transaction(transaction, private_key)
-        
-        # Gửi giao dịch
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        # Ký và gửi giao dịch
+        tx_hash = tx_manager.submit(transaction)
         print(f"Giao dịch transfer đã được gửi: {tx_hash.hex()}")
         
         # Đợi giao dịch được xác nhận
         print("Đang đợi giao dịch được xác nhận...")
-        tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        tx_receipt = tx_manager.wait_for_receipt(tx_hash)
+        print(f"Giao dịch được đưa vào block sau {tx_manager.inclusion_time(tx_hash):.1f} giây")
         
         if tx_receipt.status == 1:
             print(f"Giao dịch thành công!")
@@ -321,24 +570,19 @@ def main():
             print("Thoát chương trình.")
             return
     
-    # Kiểm tra xem contract đã được biên dịch chưa
-    if os.path.exists(COMPILED_PATH):
-        print(f"\nĐã tìm thấy contract đã biên dịch tại {COMPILED_PATH}")
-        with open(COMPILED_PATH, "r") as f:
-            contract_interface = json.load(f)
-    else:
-        # Biên dịch contract
-        contract_interface = compile_contract()
-        if not contract_interface:
-            print("Không thể tiếp tục do lỗi biên dịch.")
-            return
+    # Đọc contract đã biên dịch hoặc biên dịch contract
+    contract_interface = load_compiled_contract()
+    if not contract_interface:
+        print("Không thể tiếp tục do lỗi biên dịch.")
+        return
     
-    # Kiểm tra xem contract đã được triển khai chưa
-    contract_address_file = os.path.join("build", "contract_address.txt")
+    # Thông số khởi tạo cho SimpleToken
+    constructor_args = ["MyToken", "MTK", 18, 1000000]  # Tên, ký hiệu, số thập phân, tổng cung
     
-    if os.path.exists(contract_address_file):
-        with open(contract_address_file, "r") as f:
-            contract_address = f.read().strip()
+    # Kiểm tra xem contract đã được triển khai trên mạng này chưa
+    contract_address = find_existing_deployment(contract_interface, constructor_args, address)
+    
+    if contract_address:
         print(f"\nContract đã được triển khai trước đó tại địa chỉ: {contract_address}")
         
         # Xác minh contract
@@ -347,10 +591,17 @@ def main():
     else:
         # Triển khai contract
         if balance_wei > 0:
-            # Thông số khởi tạo cho SimpleToken
-            constructor_args = ["MyToken", "MTK", 18, 1000000]  # Tên, ký hiệu, số thập phân, tổng cung
-            
-            contract_address, abi = deploy_contract(private_key, contract_interface, constructor_args)
+            if USE_CREATE2:
+                factory_address, factory_abi = get_or_deploy_factory(private_key)
+                if not factory_address:
+                    print("Không thể tiếp tục do lỗi triển khai Create2Factory.")
+                    return
+                
+                contract_address, abi = deploy_contract_create2(
+                    private_key, contract_interface, constructor_args, factory_address, factory_abi
+                )
+            else:
+                contract_address, abi = deploy_contract(private_key, contract_interface, constructor_args)
             
             if contract_address and abi:
                 # Xác minh contract
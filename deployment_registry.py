@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Sổ đăng ký triển khai (deployment registry) cho nhiều mạng.
+Mỗi bản ghi được định danh bởi (chain_id, hash của bytecode, tham số constructor),
+nhờ đó một contract đã triển khai chỉ cần một lần gọi eth_getCode để xác nhận
+thay vì gửi lại giao dịch triển khai.
+Hỗ trợ tính trước địa chỉ contract triển khai qua factory CREATE2 (src/Create2Factory.sol).
+Bản thân factory được triển khai qua deterministic-deployment proxy nên địa chỉ của nó
+chỉ phụ thuộc vào bytecode, không phụ thuộc vào tài khoản hay nonce của người triển khai.
+"""
+
+import os
+import json
+from web3 import Web3
+
+# Đường dẫn đến file sổ đăng ký triển khai
+REGISTRY_PATH = os.path.join("build", "deployments.json")
+
+# Deterministic-deployment proxy chuẩn, có cùng địa chỉ trên hầu hết các mạng EVM
+# Dữ liệu gọi proxy là salt (32 byte) nối với bytecode khởi tạo
+DETERMINISTIC_DEPLOYER = "0x4e59b44847b379578588920cA78FbF26c0B4956C"
+
+# Salt cố định dùng để triển khai Create2Factory qua proxy
+FACTORY_SALT = b"\x00" * 32
+
+
+def load_registry(path=REGISTRY_PATH):
+    """Đọc sổ đăng ký triển khai từ file JSON"""
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_registry(registry, path=REGISTRY_PATH):
+    """Lưu sổ đăng ký triển khai vào file JSON"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    # Ghi ra file tạm rồi thay thế để không làm hỏng sổ đăng ký nếu bị ngắt giữa chừng
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(registry, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def artifact_hash(bytecode):
+    """Tính hash keccak256 của bytecode đã biên dịch"""
+    return Web3.keccak(hexstr=bytecode).hex()
+
+
+def args_hash(constructor_args):
+    """Tính hash keccak256 của tham số constructor"""
+    return Web3.keccak(text=json.dumps(list(constructor_args))).hex()
+
+
+def registry_key(bytecode, constructor_args, deployer=None):
+    """
+    Tạo khóa của bản ghi từ bytecode và tham số constructor.
+    Địa chỉ CREATE2 phụ thuộc vào người gửi nên khóa của bản ghi CREATE2 có thêm deployer.
+    """
+    key = f"{artifact_hash(bytecode)}:{args_hash(constructor_args)}"
+    if deployer:
+        key += f":{Web3.to_checksum_address(deployer)}"
+    return key
+
+
+def find_deployment(registry, chain_id, bytecode, constructor_args, deployer=None):
+    """
+    Tìm bản ghi triển khai trên mạng chain_id, trả về None nếu chưa có.
+    Nếu có deployer, ưu tiên bản ghi CREATE2 của chính deployer đó.
+    """
+    entries = registry.get(str(chain_id), {})
+    if deployer:
+        entry = entries.get(registry_key(bytecode, constructor_args, deployer))
+        if entry:
+            return entry
+    return entries.get(registry_key(bytecode, constructor_args))
+
+
+def find_deployment_by_name(registry, chain_id, contract_name):
+    """Tìm bản ghi triển khai mới nhất của contract theo tên trên mạng chain_id"""
+    entries = [
+        entry for entry in registry.get(str(chain_id), {}).values()
+        if entry.get("contract") == contract_name
+    ]
+    if not entries:
+        return None
+    # Bản ghi chỉ được phát hiện (không có deployed_at) xếp sau bản ghi do script triển khai
+    return max(entries, key=lambda entry: entry.get("deployed_at", 0))
+
+
+def record_deployment(registry, chain_id, bytecode, constructor_args, contract_name, address,
+                      path=REGISTRY_PATH, **details):
+    """
+    Ghi bản ghi triển khai vào sổ đăng ký và lưu xuống file.
+    Bản ghi CREATE2 (method="create2") được lưu theo khóa có thêm deployer.
+    """
+    entry = {
+        "contract": contract_name,
+        "address": Web3.to_checksum_address(address),
+        "chain_id": int(chain_id),
+        "artifact_hash": artifact_hash(bytecode),
+        "constructor_args": list(constructor_args),
+    }
+    entry.update(details)
+
+    deployer = details.get("deployer") if details.get("method") == "create2" else None
+    registry.setdefault(str(chain_id), {})[registry_key(bytecode, constructor_args, deployer)] = entry
+    save_registry(registry, path)
+    return entry
+
+
+def is_deployed(w3, address):
+    """Kiểm tra địa chỉ có mã contract hay không (một lần gọi eth_getCode)"""
+    return len(w3.eth.get_code(Web3.to_checksum_address(address))) > 0
+
+
+def create2_salt(label):
+    """Chuyển nhãn salt (chuỗi) thành salt 32 byte cho CREATE2"""
+    return Web3.keccak(text=label)
+
+
+def compute_create2_address(factory_address, deployer, salt, init_code):
+    """
+    Tính trước địa chỉ contract triển khai qua Create2Factory.deploy().
+    Factory gắn salt với địa chỉ người gọi: keccak256(deployer ++ salt).
+    """
+    bound_salt = Web3.solidity_keccak(["address", "bytes32"], [deployer, salt])
+    digest = Web3.solidity_keccak(
+        ["bytes1", "address", "bytes32", "bytes32"],
+        ["0xff", factory_address, bound_salt, Web3.keccak(hexstr=init_code)]
+    )
+    return Web3.to_checksum_address(digest[12:])
+
+
+def compute_deterministic_address(init_code, salt=FACTORY_SALT):
+    """
+    Tính trước địa chỉ contract triển khai qua deterministic-deployment proxy.
+    Địa chỉ giống nhau trên mọi mạng có proxy, không cần tra sổ đăng ký.
+    """
+    digest = Web3.solidity_keccak(
+        ["bytes1", "address", "bytes32", "bytes32"],
+        ["0xff", DETERMINISTIC_DEPLOYER, salt, Web3.keccak(hexstr=init_code)]
+    )
+    return Web3.to_checksum_address(digest[12:])
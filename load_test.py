@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Script kiểm tra tải (load test) cho luồng triển khai và chuyển token SimpleToken.
+Chạy trên node phát triển (anvil, hardhat, geth --dev) hoặc chuỗi chạy trong tiến trình (eth-tester),
+gửi giao dịch transfer/approve với tốc độ mục tiêu từ nhiều tài khoản gửi, sau đó đo:
+- TPS thực tế
+- Phân vị độ trễ gửi giao dịch và độ trễ xác nhận
+- Số lỗi theo từng loại
+Kết quả được lưu dạng JSON để so sánh giữa các phiên bản.
+"""
+
+import os
+import json
+import random
+import argparse
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from web3 import Web3
+from eth_account import Account
+from transaction_manager import TransactionManager, DEFAULT_BUMP_AFTER
+
+# Đường dẫn đến file contract đã biên dịch
+COMPILED_PATH = os.path.join("build", "SimpleToken.json")
+
+# Đường dẫn mặc định của file kết quả
+RESULTS_PATH = os.path.join("build", "load_test_results.json")
+
+# Thông số khởi tạo cho SimpleToken
+CONSTRUCTOR_ARGS = ["LoadTestToken", "LTT", 18, 1000000]
+
+# Lượng gas cố định cho transfer/approve để không phải ước tính gas cho mỗi giao dịch
+OPERATION_GAS = 100000
+
+# Các phân vị độ trễ được báo cáo
+PERCENTILES = (50, 90, 95, 99)
+
+
+def parse_args():
+    """Đọc tham số dòng lệnh"""
+    parser = argparse.ArgumentParser(description="Kiểm tra tải cho giao dịch transfer/approve của SimpleToken")
+    parser.add_argument("--rpc-url", default=os.environ.get("RPC_URL", "http://127.0.0.1:8545"),
+                        help="URL của node phát triển (mặc định: RPC_URL hoặc http://127.0.0.1:8545)")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Dùng chuỗi chạy trong tiến trình (cần eth-tester[py-evm])")
+    parser.add_argument("--senders", type=int, default=4, help="Số tài khoản gửi")
+    parser.add_argument("--rate", type=float, default=10, help="Tốc độ gửi mục tiêu (giao dịch/giây)")
+    parser.add_argument("--duration", type=float, default=30, help="Thời gian gửi giao dịch (giây)")
+    parser.add_argument("--approve-ratio", type=float, default=0.2,
+                        help="Tỉ lệ giao dịch approve, phần còn lại là transfer")
+    parser.add_argument("--workers", type=int, default=64, help="Số luồng gửi giao dịch")
+    parser.add_argument("--funder-key", default=os.environ.get("FUNDER_PRIVATE_KEY"),
+                        help="Private key tài khoản cấp ETH (mặc định: tài khoản mở khóa đầu tiên của node)")
+    parser.add_argument("--fund-eth", type=float, default=1, help="Số ETH cấp cho mỗi tài khoản gửi")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="Khoảng thời gian giữa các lượt kiểm tra giao dịch của mỗi tài khoản gửi (giây)")
+    parser.add_argument("--bump-after", type=float, default=DEFAULT_BUMP_AFTER,
+                        help="Số giây chờ trước khi tăng phí giao dịch bị kẹt")
+    parser.add_argument("--timeout", type=float, default=120, help="Thời gian chờ xác nhận tối đa (giây)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed cho việc chọn giao dịch ngẫu nhiên")
+    parser.add_argument("--output", default=RESULTS_PATH, help="File JSON lưu kết quả")
+    return parser.parse_args()
+
+
+def connect(args):
+    """Kết nối đến node phát triển hoặc tạo chuỗi chạy trong tiến trình"""
+    if not args.in_process:
+        return Web3(Web3.HTTPProvider(args.rpc_url)), None
+
+    try:
+        from web3 import EthereumTesterProvider
+        import eth_tester  # noqa: F401
+    except ImportError:
+        print("Lỗi: Cần cài đặt eth-tester[py-evm] để chạy chuỗi trong tiến trình")
+        return None, None
+
+    class SerializedTesterProvider(EthereumTesterProvider):
+        """eth-tester không an toàn khi gọi từ nhiều luồng, vì vậy tuần tự hóa các yêu cầu"""
+        _request_lock = threading.Lock()
+
+        def make_request(self, method, params):
+            with self._request_lock:
+                return super().make_request(method, params)
+
+    provider = SerializedTesterProvider()
+    funder_key = provider.ethereum_tester.backend.account_keys[0]
+    return Web3(provider), Web3.to_hex(funder_key.to_bytes())
+
+
+def load_contract_interface():
+    """Đọc ABI và bytecode của contract từ file JSON"""
+    try:
+        with open(COMPILED_PATH, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"Không tìm thấy file {COMPILED_PATH}")
+        return None
+
+
+def fund_senders(w3, funder_key, senders, amount_wei, timeout):
+    """Cấp ETH cho các tài khoản gửi"""
+    print(f"\n=== Cấp {Web3.from_wei(amount_wei, 'ether')} ETH cho {len(senders)} tài khoản gửi ===")
+
+    if funder_key:
+        funder = TransactionManager(w3, funder_key, poll_interval=0.1)
+        tx_hashes = [
+            funder.submit({"to": sender.address, "value": amount_wei, "gas": 21000})
+            for sender in senders
+        ]
+        receipts = [funder.wait_for_receipt(tx_hash, timeout) for tx_hash in tx_hashes]
+    else:
+        # Node phát triển có tài khoản đã mở khóa
+        funder_address = w3.eth.accounts[0]
+        tx_hashes = [
+            w3.eth.send_transaction({"from": funder_address, "to": sender.address, "value": amount_wei})
+            for sender in senders
+        ]
+        receipts = [w3.eth.wait_for_transaction_receipt(tx_hash, timeout) for tx_hash in tx_hashes]
+
+    return all(receipt.status == 1 for receipt in receipts)
+
+
+def setup_token(w3, contract_interface, managers, timeout):
+    """Triển khai SimpleToken từ tài khoản gửi đầu tiên và chia token cho các tài khoản gửi"""
+    print("\n=== Triển khai SimpleToken cho kiểm tra tải ===")
+
+    deployer = managers[0]
+    SimpleToken = w3.eth.contract(abi=contract_interface["abi"], bytecode=contract_interface["bin"])
+    _, receipt = deployer.send_transaction(
+        SimpleToken.constructor(*CONSTRUCTOR_ARGS).build_transaction({
+            "from": deployer.address,
+            "gas": 3000000,
+            "chainId": deployer.chain_id,
+            **deployer.suggest_fees()
+        }),
+        timeout
+    )
+    if receipt.status != 1:
+        print("Giao dịch triển khai thất bại!")
+        return None
+
+    token_contract = w3.eth.contract(address=receipt.contractAddress, abi=contract_interface["abi"])
+    print(f"Contract đã được triển khai tại địa chỉ: {receipt.contractAddress}")
+
+    # Chia đều token cho các tài khoản gửi
+    share = token_contract.functions.balanceOf(deployer.address).call() // len(managers)
+    fees = deployer.suggest_fees()
+    tx_hashes = [
+        deployer.submit(token_contract.functions.transfer(manager.address, share).build_transaction({
+            "from": deployer.address,
+            "gas": OPERATION_GAS,
+            "chainId": deployer.chain_id,
+            **fees
+        }))
+        for manager in managers[1:]
+    ]
+    for tx_hash in tx_hashes:
+        if deployer.wait_for_receipt(tx_hash, timeout).status != 1:
+            print("Không thể chia token cho các tài khoản gửi")
+            return None
+
+    return token_contract
+
+
+def percentile(sorted_values, p):
+    """Phân vị theo phương pháp nearest-rank"""
+    if not sorted_values:
+        return None
+    rank = max(int(-(-p * len(sorted_values) // 100)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize_latencies(values):
+    """Tóm tắt độ trễ (mili giây)"""
+    values = sorted(value * 1000 for value in values)
+    summary = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+    summary["mean"] = sum(values) / len(values) if values else None
+    summary["max"] = values[-1] if values else None
+    return summary
+
+
+def run_operation(manager, token_contract, operation, counterparty, amount, fees, scheduled_at):
+    """
+    Gửi một giao dịch và đo độ trễ gửi.
+    Độ trễ gửi được tính từ thời điểm giao dịch được lên lịch (không phải lúc bắt đầu gửi)
+    để thời gian chờ trong hàng đợi cũng được tính khi hệ thống bị quá tải.
+    """
+    result = {"operation": operation, "sender": manager.address}
+
+    try:
+        if operation == "approve":
+            function = token_contract.functions.approve(counterparty, amount)
+        else:
+            function = token_contract.functions.transfer(counterparty, amount)
+
+        transaction = function.build_transaction({
+            "from": manager.address,
+            "gas": OPERATION_GAS,
+            "chainId": manager.chain_id,
+            **fees
+        })
+
+        result["tx_hash"] = manager.submit(transaction)
+        result["submitted_at"] = time.perf_counter()
+        result["submit_latency"] = result["submitted_at"] - scheduled_at
+    except Exception as e:
+        result["error"] = type(e).__name__
+
+    return result
+
+
+def poll_confirmations(managers, confirmations, stop_event, poll_interval):
+    """
+    Kiểm tra giao dịch đã được xác nhận của mỗi tài khoản gửi một lần mỗi nhịp
+    (một lần gọi RPC cho mỗi tài khoản), thay vì mỗi giao dịch tự kiểm tra receipt,
+    để việc kiểm tra không tranh tài nguyên với tải đang được đo.
+    Độ trễ xác nhận vì vậy có sai số tối đa bằng poll_interval.
+    """
+    while not stop_event.is_set():
+        for manager in managers:
+            try:
+                confirmed = manager.check_pending()
+            except Exception as e:
+                print(f"Lỗi khi kiểm tra giao dịch của {manager.address}: {e}")
+                continue
+
+            confirmed_at = time.perf_counter()
+            for tx_hash in confirmed:
+                confirmations[tx_hash] = confirmed_at
+
+        stop_event.wait(poll_interval)
+
+
+def run_load(w3, token_contract, managers, args):
+    """Gửi giao dịch với tốc độ mục tiêu trong khoảng thời gian cho trước"""
+    print(f"\n=== Kiểm tra tải: {args.rate} giao dịch/giây trong {args.duration} giây "
+          f"từ {len(managers)} tài khoản gửi ===")
+
+    total = int(args.rate * args.duration)
+    interval = 1.0 / args.rate
+    addresses = [manager.address for manager in managers]
+
+    fees = managers[0].suggest_fees()
+    fees_updated_at = time.perf_counter()
+
+    confirmations = {}
+    stop_event = threading.Event()
+    poller = threading.Thread(
+        target=poll_confirmations, args=(managers, confirmations, stop_event, args.poll_interval), daemon=True
+    )
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        started_at = time.perf_counter()
+        poller.start()
+
+        for i in range(total):
+            scheduled_at = started_at + i * interval
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            # Cập nhật phí mỗi giây thay vì gọi RPC cho từng giao dịch
+            if time.perf_counter() - fees_updated_at >= 1:
+                fees = managers[0].suggest_fees()
+                fees_updated_at = time.perf_counter()
+
+            # Mọi lựa chọn ngẫu nhiên đều nằm trong vòng lặp này để --seed tái tạo được lần chạy
+            manager = managers[i % len(managers)]
+            operation = "approve" if random.random() < args.approve_ratio else "transfer"
+            counterparty = random.choice([address for address in addresses if address != manager.address])
+            amount = random.randint(1, 10 ** 18) if operation == "approve" else 1
+
+            futures.append(executor.submit(
+                run_operation, manager, token_contract, operation, counterparty, amount, fees, scheduled_at
+            ))
+
+        results = [future.result() for future in futures]
+
+    # Đợi các giao dịch đã gửi được xác nhận
+    tx_hashes = [result["tx_hash"] for result in results if "tx_hash" in result]
+    deadline = time.perf_counter() + args.timeout
+    while time.perf_counter() < deadline and any(tx_hash not in confirmations for tx_hash in tx_hashes):
+        time.sleep(args.poll_interval)
+    stop_event.set()
+    poller.join()
+
+    # Lấy receipt sau khi đo xong để việc này không ảnh hưởng đến kết quả
+    managers_by_address = {manager.address: manager for manager in managers}
+    for result in results:
+        if "tx_hash" not in result:
+            continue
+
+        confirmed_at = confirmations.get(result["tx_hash"])
+        if confirmed_at is None:
+            result["error"] = "TimeExhausted"
+            continue
+
+        try:
+            receipt = managers_by_address[result["sender"]].wait_for_receipt(result["tx_hash"], args.timeout)
+        except Exception as e:
+            result["error"] = type(e).__name__
+            continue
+
+        result["confirmed_at"] = confirmed_at
+        result["confirm_latency"] = confirmed_at - result["submitted_at"]
+        if receipt.status != 1:
+            result["error"] = "Reverted"
+
+    return results, started_at
+
+
+def git_commit():
+    """Commit hiện tại của mã nguồn để đối chiếu kết quả giữa các phiên bản, None nếu không xác định được"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(w3, args, results, managers, started_at):
+    """Tổng hợp kết quả kiểm tra tải"""
+    submitted = [result for result in results if "submitted_at" in result]
+    confirmed = [result for result in results if "confirmed_at" in result and "error" not in result]
+    errors = {}
+    for result in results:
+        if "error" in result:
+            errors[result["error"]] = errors.get(result["error"], 0) + 1
+
+    # Tốc độ gửi thực tế tính đến lúc giao dịch cuối cùng thực sự được gửi
+    last_submitted_at = max([result["submitted_at"] for result in submitted], default=started_at)
+    finished_at = max([result["confirmed_at"] for result in confirmed], default=last_submitted_at)
+    elapsed = max(finished_at - started_at, 1e-9)
+
+    operations = {}
+    for result in results:
+        operations[result["operation"]] = operations.get(result["operation"], 0) + 1
+
+    return {
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "chain_id": w3.eth.chain_id,
+        "config": {
+            "rpc_url": None if args.in_process else args.rpc_url,
+            "in_process": args.in_process,
+            "senders": args.senders,
+            "target_rate": args.rate,
+            "duration": args.duration,
+            "approve_ratio": args.approve_ratio,
+            "workers": args.workers,
+            "seed": args.seed,
+            "poll_interval": args.poll_interval,
+            "bump_after": args.bump_after,
+            "timeout": args.timeout,
+            "fund_eth": args.fund_eth,
+            "git_commit": git_commit()
+        },
+        "scheduled": len(results),
+        "submitted": len(submitted),
+        "confirmed": len(confirmed),
+        "operations": operations,
+        "elapsed_seconds": elapsed,
+        "submit_rate": len(submitted) / max(last_submitted_at - started_at, 1e-9),
+        "tps": len(confirmed) / elapsed,
+        "submit_latency_ms": summarize_latencies(
+            [result["submit_latency"] for result in results if "submit_latency" in result]
+        ),
+        "confirm_latency_ms": summarize_latencies([result["confirm_latency"] for result in confirmed]),
+        "errors": {
+            "total": sum(errors.values()),
+            "by_type": errors
+        },
+        "fee_bumps": sum(manager.bump_count for manager in managers)
+    }
+
+
+def print_report(report):
+    """In tóm tắt kết quả kiểm tra tải"""
+    print("\n=== Kết quả kiểm tra tải ===")
+    print(f"Số giao dịch đã lên lịch: {report['scheduled']} ({report['operations']})")
+    print(f"Số giao dịch đã gửi: {report['submitted']}")
+    print(f"Số giao dịch đã xác nhận: {report['confirmed']}")
+    print(f"Tốc độ gửi: {report['submit_rate']:.2f} giao dịch/giây")
+    print(f"TPS thực tế: {report['tps']:.2f}")
+
+    for label, key in (("Độ trễ gửi", "submit_latency_ms"), ("Độ trễ xác nhận", "confirm_latency_ms")):
+        latencies = report[key]
+        if latencies["max"] is None:
+            print(f"{label}: không có dữ liệu")
+            continue
+        values = ", ".join(f"p{p}={latencies[f'p{p}']:.1f}" for p in PERCENTILES)
+        print(f"{label} (ms): {values}, max={latencies['max']:.1f}")
+
+    print(f"Số lỗi: {report['errors']['total']} {report['errors']['by_type'] or ''}")
+    print(f"Số lần tăng phí: {report['fee_bumps']}")
+
+
+def main():
+    args = parse_args()
+    print("=== KIỂM TRA TẢI TOKEN ERC-20 ===")
+
+    if args.senders < 2:
+        print("Cần ít nhất 2 tài khoản gửi")
+        return
+    if args.rate <= 0 or args.duration <= 0:
+        print("Tốc độ gửi và thời gian phải lớn hơn 0")
+        return
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    w3, in_process_funder_key = connect(args)
+    if w3 is None:
+        return
+    if not w3.is_connected():
+        print(f"Không thể kết nối đến {args.rpc_url}")
+        return
+    print(f"Chain ID: {w3.eth.chain_id}")
+
+    # Kiểm tra xem contract đã được biên dịch chưa
+    contract_interface = load_contract_interface()
+    if not contract_interface:
+        print("Vui lòng chạy compile_deploy.py trước để biên dịch contract.")
+        return
+
+    # Tạo các tài khoản gửi mới cho mỗi lần chạy
+    senders = [Account.create() for _ in range(args.senders)]
+    funder_key = args.funder_key or in_process_funder_key
+    if not fund_senders(w3, funder_key, senders, Web3.to_wei(args.fund_eth, "ether"), args.timeout):
+        print("Không thể cấp ETH cho các tài khoản gửi")
+        return
+
+    managers = [
+        TransactionManager(w3, sender.key, bump_after=args.bump_after, poll_interval=args.poll_interval)
+        for sender in senders
+    ]
+
+    token_contract = setup_token(w3, contract_interface, managers, args.timeout)
+    if token_contract is None:
+        return
+
+    results, started_at = run_load(w3, token_contract, managers, args)
+    report = build_report(w3, args, results, managers, started_at)
+    print_report(report)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nĐã lưu kết quả vào {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+/**
+ * @title Create2Factory
+ * @dev Factory triển khai contract bằng CREATE2 để có thể tính trước địa chỉ contract
+ */
+contract Create2Factory {
+    event Deployed(address indexed deployer, address indexed addr, bytes32 salt);
+
+    /**
+     * @dev Triển khai contract với salt gắn theo địa chỉ người gọi
+     * @param _salt Salt do người gọi chọn
+     * @param _bytecode Bytecode khởi tạo (bytecode + tham số constructor đã mã hóa)
+     * @return addr Địa chỉ contract vừa được triển khai
+     */
+    function deploy(bytes32 _salt, bytes memory _bytecode) public returns (address addr) {
+        // Gắn salt với msg.sender để người khác không thể chiếm trước địa chỉ này
+        bytes32 salt = keccak256(abi.encodePacked(msg.sender, _salt));
+
+        assembly {
+            addr := create2(0, add(_bytecode, 0x20), mload(_bytecode), salt)
+        }
+        require(addr != address(0), "Create2 deployment failed");
+
+        // Constructor của token cấp toàn bộ token cho msg.sender (chính là factory),
+        // vì vậy chuyển lại số token đó cho người gọi
+        (bool ok, bytes memory data) = addr.staticcall(
+            abi.encodeWithSignature("balanceOf(address)", address(this))
+        );
+        if (ok && data.length == 32) {
+            uint256 balance = abi.decode(data, (uint256));
+            if (balance > 0) {
+                (ok, ) = addr.call(
+                    abi.encodeWithSignature("transfer(address,uint256)", msg.sender, balance)
+                );
+                require(ok, "Token transfer to deployer failed");
+            }
+        }
+
+        emit Deployed(msg.sender, addr, _salt);
+    }
+
+    /**
+     * @dev Tính trước địa chỉ contract sẽ được triển khai bởi deploy()
+     * @param _deployer Địa chỉ sẽ gọi deploy()
+     * @param _salt Salt do người gọi chọn
+     * @param _bytecodeHash keccak256 của bytecode khởi tạo
+     * @return Địa chỉ contract
+     */
+    function computeAddress(
+        address _deployer,
+        bytes32 _salt,
+        bytes32 _bytecodeHash
+    ) public view returns (address) {
+        bytes32 salt = keccak256(abi.encodePacked(_deployer, _salt));
+        return address(uint160(uint256(keccak256(
+            abi.encodePacked(bytes1(0xff), address(this), salt, _bytecodeHash)
+        ))));
+    }
+}
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Quản lý giao dịch cho một tài khoản gửi.
+- Tự cấp phát nonce và theo dõi thời gian từ lúc gửi đến lúc được đưa vào block theo từng nonce
+- Giao dịch bị kẹt quá lâu sẽ được thay thế bằng bản sao có phí cao hơn với cùng nonce
+- Phát hiện và lấp các nonce bị bỏ trống để giao dịch phía sau không bị chặn
+"""
+
+import math
+import threading
+import time
+from eth_account import Account
+from web3.exceptions import TransactionNotFound, TimeExhausted
+
+# Thời gian chờ (giây) trước khi thay thế giao dịch bằng bản sao có phí cao hơn
+DEFAULT_BUMP_AFTER = 60
+
+# Hệ số tăng phí mỗi lần thay thế (geth yêu cầu phí tăng ít nhất 10%)
+DEFAULT_BUMP_FACTOR = 1.125
+
+# Số lần tăng phí tối đa cho mỗi nonce
+DEFAULT_MAX_BUMPS = 5
+
+# Khoảng thời gian (giây) giữa các lần kiểm tra receipt
+DEFAULT_POLL_INTERVAL = 2
+
+# Thời gian chờ tối đa (giây) để giao dịch được xác nhận
+DEFAULT_TIMEOUT = 600
+
+FEE_KEYS = ("gasPrice", "maxFeePerGas", "maxPriorityFeePerGas")
+
+
+class NonceConsumedError(Exception):
+    """Nonce đã được dùng bởi một giao dịch khác không do manager gửi"""
+
+
+def raw_transaction(signed_tx):
+    """Lấy giao dịch đã ký dạng bytes (tương thích nhiều phiên bản eth-account)"""
+    raw = getattr(signed_tx, "raw_transaction", None)
+    return raw if raw is not None else signed_tx.rawTransaction
+
+
+class TransactionManager:
+    """Gửi giao dịch cho một tài khoản, tự tăng phí khi giao dịch bị kẹt"""
+
+    def __init__(self, w3, private_key, bump_after=DEFAULT_BUMP_AFTER, bump_factor=DEFAULT_BUMP_FACTOR,
+                 max_bumps=DEFAULT_MAX_BUMPS, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.w3 = w3
+        self.private_key = private_key
+        self.address = Account.from_key(private_key).address
+        self.bump_after = bump_after
+        self.bump_factor = bump_factor
+        self.max_bumps = max_bumps
+        self.poll_interval = poll_interval
+
+        # Thời gian từ lúc gửi đến lúc được đưa vào block (giây) theo từng nonce
+        self.inclusion_times = {}
+        # Tổng số lần tăng phí đã gửi thành công
+        self.bump_count = 0
+
+        self._lock = threading.RLock()
+        self._chain_id = None
+        self._first_nonce = None
+        self._next_nonce = None
+        self._checked_nonce = None
+        self._records = {}
+        self._nonce_by_hash = {}
+        # Thời điểm phát hiện nonce không do manager gửi bị node bỏ trống
+        self._missing_since = {}
+
+    @property
+    def chain_id(self):
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        return self._chain_id
+
+    def suggest_fees(self):
+        """Đề xuất phí theo EIP-1559, dùng gasPrice nếu mạng không hỗ trợ"""
+        base_fee = self.w3.eth.get_block("latest").get("baseFeePerGas")
+        if base_fee is None:
+            return {"gasPrice": self.w3.eth.gas_price}
+
+        try:
+            priority_fee = self.w3.eth.max_priority_fee
+        except Exception:
+            priority_fee = max(self.w3.eth.gas_price - base_fee, 1)
+
+        # maxFeePerGas cho phép base fee tăng gấp đôi trước khi giao dịch bị kẹt
+        return {
+            "maxFeePerGas": 2 * base_fee + priority_fee,
+            "maxPriorityFeePerGas": priority_fee
+        }
+
+    def submit(self, transaction):
+        """Ký và gửi giao dịch với nonce do manager cấp phát, trả về tx hash"""
+        tx = dict(transaction)
+        tx.setdefault("from", self.address)
+        tx.setdefault("chainId", self.chain_id)
+        if not any(key in tx for key in FEE_KEYS):
+            tx.update(self.suggest_fees())
+        if "gas" not in tx:
+            tx["gas"] = self.w3.eth.estimate_gas(tx)
+
+        # Giữ khóa trong lúc gửi để các nonce được gửi theo đúng thứ tự.
+        # Nếu gửi lỗi, nonce không bị tăng nên không tạo ra khoảng trống.
+        with self._lock:
+            self._sync_nonce()
+            nonce = self._next_nonce
+            tx["nonce"] = nonce
+
+            tx_hash, raw = self._sign_and_send(tx)
+            now = time.monotonic()
+
+            self._next_nonce = nonce + 1
+            self._records[nonce] = {
+                "tx": tx,
+                "raw": raw,
+                "hashes": [tx_hash],
+                "submitted_at": now,
+                "sent_at": now,
+                "bumps": 0,
+                "receipt": None
+            }
+            self._nonce_by_hash[tx_hash] = nonce
+
+        return tx_hash
+
+    def wait_for_receipt(self, tx_hash, timeout=DEFAULT_TIMEOUT):
+        """
+        Đợi giao dịch được xác nhận, tăng phí nếu bị kẹt quá bump_after giây.
+        tx_hash có thể là hash của bất kỳ phiên bản nào của giao dịch.
+        """
+        nonce = self._nonce_by_hash[tx_hash]
+        deadline = time.monotonic() + timeout
+
+        while True:
+            # Chỉ lấy nonce đã xác nhận một lần cho mỗi lần kiểm tra
+            confirmed_nonce = self.w3.eth.get_transaction_count(self.address, "latest")
+
+            receipt = self._find_receipt(nonce, confirmed_nonce)
+            if receipt is not None:
+                return receipt
+
+            if time.monotonic() > deadline:
+                raise TimeExhausted(
+                    f"Giao dịch nonce {nonce} ({tx_hash.hex()}) chưa được xác nhận sau {timeout} giây"
+                )
+
+            self._service_stuck(nonce, confirmed_nonce)
+            time.sleep(self.poll_interval)
+
+    def send_transaction(self, transaction, timeout=DEFAULT_TIMEOUT):
+        """Gửi giao dịch và đợi được xác nhận, trả về (tx_hash, receipt)"""
+        tx_hash = self.submit(transaction)
+        return tx_hash, self.wait_for_receipt(tx_hash, timeout)
+
+    def check_pending(self):
+        """
+        Kiểm tra tất cả giao dịch đang chờ của tài khoản trong một lượt, chỉ với một lần gọi
+        eth_getTransactionCount. Giao dịch bị kẹt được tăng phí như trong wait_for_receipt.
+        Trả về danh sách tx hash (hash ban đầu do submit trả về) của các nonce vừa được xác nhận;
+        receipt có thể lấy sau bằng wait_for_receipt.
+        """
+        with self._lock:
+            if self._next_nonce is None:
+                return []
+            if self._checked_nonce is None:
+                self._checked_nonce = self._first_nonce
+            next_nonce = self._next_nonce
+
+        confirmed_nonce = self.w3.eth.get_transaction_count(self.address, "latest")
+        checked_until = min(confirmed_nonce, next_nonce)
+
+        confirmed = [
+            self._records[nonce]["hashes"][0]
+            for nonce in range(self._checked_nonce, checked_until)
+            if nonce in self._records
+        ]
+        self._checked_nonce = max(self._checked_nonce, checked_until)
+
+        if confirmed_nonce < next_nonce:
+            self._service_stuck(next_nonce - 1, confirmed_nonce)
+        return confirmed
+
+    def inclusion_time(self, tx_hash):
+        """Thời gian (giây) từ lúc gửi đến lúc giao dịch được đưa vào block, None nếu chưa xác nhận"""
+        return self.inclusion_times.get(self._nonce_by_hash.get(tx_hash))
+
+    def fill_nonce_gaps(self, confirmed_nonce=None):
+        """
+        Lấp các nonce bị bỏ trống giữa nonce đã xác nhận và nonce tiếp theo.
+        Giao dịch của manager bị kẹt và đã bị loại khỏi mempool sẽ được gửi lại.
+        Nonce không do manager gửi chỉ được lấp bằng giao dịch chuyển 0 ETH cho chính mình
+        khi node không còn giữ giao dịch của nonce đó trong ít nhất bump_after giây,
+        và không bao giờ lấp nonce nhỏ hơn nonce đầu tiên manager đồng bộ được.
+        """
+        with self._lock:
+            if self._next_nonce is None:
+                return
+
+            if confirmed_nonce is None:
+                confirmed_nonce = self.w3.eth.get_transaction_count(self.address, "latest")
+            pending_nonce = None
+            now = time.monotonic()
+
+            for nonce in range(max(confirmed_nonce, self._first_nonce), self._next_nonce):
+                record = self._records.get(nonce)
+                if record is None:
+                    if pending_nonce is None:
+                        pending_nonce = self.w3.eth.get_transaction_count(self.address, "pending")
+                    if pending_nonce > nonce:
+                        # Node vẫn giữ giao dịch của nonce này (có thể do nơi khác gửi)
+                        self._missing_since.pop(nonce, None)
+                        continue
+
+                    missing_since = self._missing_since.setdefault(nonce, now)
+                    if now - missing_since >= self.bump_after:
+                        self._send_filler(nonce)
+                        if nonce in self._records:
+                            del self._missing_since[nonce]
+                elif (record["receipt"] is None and now - record["sent_at"] >= self.bump_after
+                        and self._is_dropped(record)):
+                    self._rebroadcast(nonce, record)
+
+    def _sync_nonce(self):
+        """Đồng bộ nonce với mạng (chỉ tăng, không giảm)"""
+        chain_nonce = self.w3.eth.get_transaction_count(self.address, "pending")
+        if self._next_nonce is None or chain_nonce > self._next_nonce:
+            self._next_nonce = chain_nonce
+        if self._first_nonce is None:
+            self._first_nonce = chain_nonce
+
+    def _sign(self, tx):
+        """Ký giao dịch, trả về (tx hash tính tại chỗ, giao dịch đã ký dạng bytes)"""
+        signed_tx = self.w3.eth.account.sign_transaction(tx, self.private_key)
+        return signed_tx.hash, raw_transaction(signed_tx)
+
+    def _sign_and_send(self, tx):
+        tx_hash, raw = self._sign(tx)
+        self.w3.eth.send_raw_transaction(raw)
+        return tx_hash, raw
+
+    def _find_receipt(self, nonce, confirmed_nonce):
+        """
+        Tìm receipt của bất kỳ phiên bản nào của giao dịch với nonce này.
+        confirmed_nonce phải được lấy trước khi tìm receipt: nếu nonce đã được dùng
+        mà không có receipt nào của manager thì nonce đã bị giao dịch khác chiếm.
+        """
+        record = self._records[nonce]
+        if record["receipt"] is not None:
+            return record["receipt"]
+
+        for tx_hash in reversed(list(record["hashes"])):
+            try:
+                receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                continue
+
+            with self._lock:
+                if record["receipt"] is None:
+                    record["receipt"] = receipt
+                    self.inclusion_times[nonce] = time.monotonic() - record["submitted_at"]
+            return receipt
+
+        if confirmed_nonce > nonce:
+            raise NonceConsumedError(f"Nonce {nonce} đã được dùng bởi một giao dịch khác")
+        return None
+
+    def _service_stuck(self, nonce, confirmed_nonce):
+        """
+        Gửi lại hoặc tăng phí các giao dịch bị kẹt từ nonce đang chặn đến nonce này.
+        Luôn tăng phí nonce đang chặn; các nonce phía sau chỉ bị kẹt vì nonce đó nên
+        chỉ được tăng phí khi phí của chúng thấp hơn phí đề xuất hiện tại.
+        """
+        with self._lock:
+            self.fill_nonce_gaps(confirmed_nonce)
+
+            now = time.monotonic()
+            suggested = None
+            for pending_nonce in range(confirmed_nonce, nonce + 1):
+                record = self._records.get(pending_nonce)
+                if record is None or record["receipt"] is not None:
+                    continue
+                if now - record["sent_at"] < self.bump_after or record["bumps"] >= self.max_bumps:
+                    continue
+
+                if suggested is None:
+                    suggested = self.suggest_fees()
+                if pending_nonce > confirmed_nonce and not self._is_underpriced(record["tx"], suggested):
+                    continue
+                self._bump(pending_nonce, record, suggested)
+
+    @staticmethod
+    def _is_underpriced(tx, suggested):
+        """Phí tối đa của giao dịch thấp hơn phí đề xuất"""
+        max_fee = tx.get("maxFeePerGas", tx.get("gasPrice"))
+        return max_fee < suggested.get("maxFeePerGas", suggested.get("gasPrice"))
+
+    def _is_dropped(self, record):
+        """Giao dịch không còn trong mempool của node (và chưa được đưa vào block)"""
+        for tx_hash in record["hashes"]:
+            try:
+                self.w3.eth.get_transaction(tx_hash)
+                return False
+            except TransactionNotFound:
+                continue
+        return True
+
+    def _rebroadcast(self, nonce, record):
+        """Gửi lại giao dịch đã ký gần nhất của nonce"""
+        try:
+            self.w3.eth.send_raw_transaction(record["raw"])
+            print(f"Đã gửi lại giao dịch bị loại khỏi mempool (nonce {nonce})")
+        except Exception as e:
+            print(f"Không thể gửi lại giao dịch nonce {nonce}: {e}")
+        record["sent_at"] = time.monotonic()
+
+    def _bump(self, nonce, record, suggested=None):
+        """Thay thế giao dịch bằng bản sao có phí cao hơn với cùng nonce"""
+        tx = dict(record["tx"])
+        if suggested is None:
+            suggested = self.suggest_fees()
+        for key in FEE_KEYS:
+            if key in tx:
+                tx[key] = max(math.ceil(tx[key] * self.bump_factor), tx[key] + 1, suggested.get(key, 0))
+        if "maxFeePerGas" in tx:
+            tx["maxFeePerGas"] = max(tx["maxFeePerGas"], tx["maxPriorityFeePerGas"])
+
+        record["bumps"] += 1
+        record["sent_at"] = time.monotonic()
+        # Ghi nhận phí mới kể cả khi gửi lỗi để lần tăng sau dùng phí cao hơn
+        record["tx"] = tx
+
+        # Ghi nhận hash trước khi gửi: node có thể đã nhận giao dịch thay thế
+        # dù lời gọi gửi báo lỗi (ví dụ hết thời gian chờ HTTP)
+        tx_hash, raw = self._sign(tx)
+        record["raw"] = raw
+        record["hashes"].append(tx_hash)
+        self._nonce_by_hash[tx_hash] = nonce
+
+        try:
+            self.w3.eth.send_raw_transaction(raw)
+        except Exception as e:
+            print(f"Không thể tăng phí giao dịch nonce {nonce}: {e}")
+            return
+
+        self.bump_count += 1
+        print(f"Đã tăng phí giao dịch nonce {nonce} (lần {record['bumps']}): {tx_hash.hex()}")
+
+    def _send_filler(self, nonce):
+        """Lấp nonce trống bằng giao dịch chuyển 0 ETH cho chính mình"""
+        tx = {
+            "from": self.address,
+            "to": self.address,
+            "value": 0,
+            "gas": 21000,
+            "nonce": nonce,
+            "chainId": self.chain_id
+        }
+        tx.update(self.suggest_fees())
+
+        try:
+            tx_hash, raw = self._sign_and_send(tx)
+        except Exception as e:
+            print(f"Không thể lấp nonce trống {nonce}: {e}")
+            return
+
+        now = time.monotonic()
+        self._records[nonce] = {
+            "tx": tx,
+            "raw": raw,
+            "hashes": [tx_hash],
+            "submitted_at": now,
+            "sent_at": now,
+            "bumps": 0,
+            "receipt": None
+        }
+        self._nonce_by_hash[tx_hash] = nonce
+        print(f"Đã lấp nonce trống {nonce}: {tx_hash.hex()}")